@@ -3,11 +3,13 @@
 # Descriptive + Correlation Analysis
 # ======================================
 
+import io
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 from scipy import stats
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 # --------------------------------------
 # PAGE CONFIG
@@ -21,7 +23,7 @@ st.set_page_config(
 # --------------------------------------
 # CSS STYLE
 # --------------------------------------
-st.markdown("""
+CSS = """
 <style>
 .stApp {
     background: linear-gradient(135deg, #FF97B5, #6E2A85);
@@ -67,7 +69,12 @@ section[data-testid="stSidebar"] {
     padding: 10px 20px;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Re-emitted on every run: Streamlit drops elements a rerun does not
+# produce, so a once-only marker would strip the styling after the
+# first interaction.
+st.markdown(CSS, unsafe_allow_html=True)
 
 # --------------------------------------
 # LANGUAGE DICTIONARY
@@ -89,7 +96,8 @@ LANG = {
         "method": "Correlation Method",
         "run": "Run Analysis",
         "result": "Result",
-        "interp": "Interpretation"
+        "interp": "Interpretation",
+        "no_numeric": "The uploaded file has no numeric columns to analyze."
     },
     "Indonesia": {
         "home": "Beranda",
@@ -107,23 +115,268 @@ LANG = {
         "method": "Metode Korelasi",
         "run": "Jalankan Analisis",
         "result": "Hasil",
-        "interp": "Interpretasi"
+        "interp": "Interpretasi",
+        "no_numeric": "File yang diunggah tidak memiliki kolom numerik untuk dianalisis."
     }
 }
 
+# --------------------------------------
+# DATA LOADING
+# --------------------------------------
+def downcast_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    # Survey answers are mostly small whole numbers; narrow them to the
+    # smallest integer dtype so every later scan touches fewer bytes.
+    # Columns with fractions or missing values stay float64.
+    numeric_cols = df.select_dtypes(include=np.number).columns
+    if len(numeric_cols):
+        df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, downcast="integer")
+    return df
+
+# Only re-uploads of identical bytes hit this cache, so keep it small
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_df(file_bytes: bytes, name: str) -> pd.DataFrame:
+    buffer = io.BytesIO(file_bytes)
+    if name.endswith(("xlsx", "xls")):
+        # calamine needs pandas >= 2.2 and python-calamine
+        try:
+            df = pd.read_excel(buffer, engine="calamine")
+        except (ImportError, ValueError):
+            buffer.seek(0)
+            df = pd.read_excel(buffer)
+    else:
+        # pyarrow rejects rows with missing trailing cells, which the
+        # default parser fills with NaN
+        try:
+            df = pd.read_csv(buffer, engine="pyarrow")
+        except (ImportError, ValueError):
+            buffer.seek(0)
+            df = pd.read_csv(buffer)
+    return downcast_numeric(df)
+
+# --------------------------------------
+# DESCRIPTIVE STATISTICS
+# --------------------------------------
+DESC_LABELS = {
+    "mean": "Mean / Rata-rata",
+    "median": "Median",
+    "min": "Minimum",
+    "max": "Maximum",
+    "std": "Std Deviation"
+}
+
+def small_int_offsets(values: np.ndarray):
+    # Integer data spanning a small range (e.g. Likert scales) can be
+    # counted with np.bincount on offsets from the minimum.
+    if values.size == 0 or not np.issubdtype(values.dtype, np.integer):
+        return None
+    lo = int(values.min())
+    if int(values.max()) - lo >= 1000:
+        return None
+    return values.astype(np.int64) - lo, lo
+
+def fast_mode(s: pd.Series):
+    values = s.dropna().to_numpy()
+    if values.size == 0:
+        return np.nan
+
+    offsets = small_int_offsets(values)
+    if offsets is not None:
+        shifted, lo = offsets
+        return np.bincount(shifted).argmax() + lo
+
+    uniques, counts = np.unique(values, return_counts=True)
+    return uniques[counts.argmax()]
+
+def frequency_table(s: pd.Series) -> pd.DataFrame:
+    values = s.dropna().to_numpy()
+    offsets = small_int_offsets(values)
+    if offsets is not None:
+        shifted, lo = offsets
+        counts = np.bincount(shifted)
+        seen = np.flatnonzero(counts)
+        freq = pd.Series(counts[seen], index=pd.Index(seen + lo, name=s.name))
+    else:
+        freq = s.value_counts().sort_index()
+
+    return pd.DataFrame({
+        "Frequency": freq,
+        "Percentage (%)": (freq / freq.sum() * 100).round(2)
+    })
+
+@st.cache_data(show_spinner=False)
+def compute_desc(df: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
+    if not numeric_cols:
+        labels = list(DESC_LABELS.values())
+        return pd.DataFrame(columns=labels[:2] + ["Mode"] + labels[2:]), numeric_cols
+
+    sub = df[numeric_cols]
+
+    desc = sub.agg(list(DESC_LABELS)).T
+    desc.insert(2, "mode", [fast_mode(sub[c]) for c in numeric_cols])
+    desc = desc.rename(columns={**DESC_LABELS, "mode": "Mode"})
+    return desc, numeric_cols
+
+# --------------------------------------
+# CHARTS
+# --------------------------------------
+def hist_bins(values: np.ndarray):
+    # One bar per answer on discrete scales, numpy's "auto" rule otherwise
+    if values.size and np.all(values == np.round(values)):
+        lo, hi = float(values.min()), float(values.max())
+        if hi - lo <= 20:
+            return np.arange(lo - 0.5, hi + 1.5)
+    return "auto"
+
+def histogram_counts(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return np.histogram(values, bins=hist_bins(values))
+
+# Caches the rendered PNG rather than the Figure, so sessions never share
+# a live matplotlib object. Keyed on the upload's file_id; _values is not
+# hashed.
+@st.cache_data(show_spinner=False, max_entries=8)
+def hist_box_png(df_key: str, col: str, hist_title: str, box_title: str,
+                 _values: np.ndarray) -> bytes:
+    counts, edges = histogram_counts(_values)
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots(1, 2)
+    ax[0].bar(edges[:-1], counts, width=np.diff(edges), align="edge")
+    ax[0].set_title(hist_title)
+
+    ax[1].boxplot(_values, vert=False)
+    ax[1].set_title(box_title)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+# --------------------------------------
+# CORRELATION
+# --------------------------------------
+X_VARS = frozenset({"x1", "x2", "x3", "x4", "x5", "x_total"})
+Y_VARS = frozenset({"y1", "y2", "y3", "y4", "y5", "y_total"})
+SCATTER_MAX_POINTS = 5000
+
+def corr_matrix(sub: pd.DataFrame, method: str) -> pd.DataFrame:
+    # Columns with missing answers come out as NaN rows/columns here;
+    # entries for complete pairs are unaffected.
+    cols = sub.columns
+    data = np.ascontiguousarray(sub.to_numpy(np.float64))
+    if method == "Spearman":
+        # Spearman is Pearson on tie-averaged ranks
+        data = stats.rankdata(data, axis=0)
+    matrix = np.corrcoef(data, rowvar=False)
+    return pd.DataFrame(np.clip(matrix, -1.0, 1.0), index=cols, columns=cols)
+
+def pair_corr(df: pd.DataFrame, cols: list[str], method: str, x: str, y: str,
+              cache: dict) -> tuple[float, int]:
+    # cache lives in session state and is reset for each upload. It holds
+    # one matrix per method and (r, n) per (method, x, y), so nothing is
+    # recomputed or hashed when a pair is run again.
+    key = (method, x, y)
+    if key in cache:
+        return cache[key]
+
+    # Pairwise complete cases: only rows missing x or y are left out
+    a = df[x].to_numpy(np.float64)
+    b = df[y].to_numpy(np.float64)
+    keep = ~(np.isnan(a) | np.isnan(b))
+    if keep.all():
+        if method not in cache:
+            cache[method] = corr_matrix(df[cols], method)
+        cache[key] = float(cache[method].loc[x, y]), len(a)
+    else:
+        a, b = a[keep], b[keep]
+        if method == "Spearman":
+            a, b = stats.rankdata(a), stats.rankdata(b)
+        cache[key] = float(np.clip(np.corrcoef(a, b)[0, 1], -1.0, 1.0)), int(keep.sum())
+    return cache[key]
+
+def corr_p_value(r: float, n: int) -> float:
+    # Two-sided p-value from the t statistic with n - 2 degrees of freedom.
+    # This is exact for Pearson and, like scipy's spearmanr, only an
+    # approximation for Spearman on small samples.
+    if n <= 2:
+        # Two points always lie on a line; scipy's pearsonr reports p = 1
+        return 1.0 if n == 2 else float("nan")
+    if abs(r) >= 1.0:
+        return 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt((n - 2) / (1.0 - r * r))
+    return float(2 * stats.t.sf(abs(t), n - 2))
+
+# --------------------------------------
+# CORRELATION CARD
+# --------------------------------------
+# Runs as a fragment: picking variables or clicking Run Analysis only
+# reruns this card, not the data load, tables and charts above it.
+@st.fragment
+def correlation_card(df: pd.DataFrame, x_vars: list[str], y_vars: list[str], T: dict, language: str):
+    x = st.selectbox(T["select_x"], x_vars)
+    y = st.selectbox(T["select_y"], y_vars)
+    method = st.selectbox(T["method"], ["Pearson", "Spearman"])
+
+    if st.button(T["run"]):
+        r, n = pair_corr(df, x_vars + y_vars, method, x, y, st.session_state["corr"])
+        p = corr_p_value(r, n)
+
+        # RESULT
+        st.subheader(T["result"])
+        st.write(f"**Correlation (r)** : {r:.3f}")
+        st.write(f"**p-value** : {p:.4f}")
+
+        # INTERPRETATION
+        st.subheader(T["interp"])
+        abs_r = abs(r)
+        strength = (
+            "very weak" if abs_r < 0.2 else
+            "weak" if abs_r < 0.4 else
+            "moderate" if abs_r < 0.6 else
+            "strong" if abs_r < 0.8 else
+            "very strong"
+        )
+
+        sig = "significant" if p < 0.05 else "not significant"
+
+        if language == "Indonesia":
+            st.write(
+                f"Terdapat **hubungan {strength}** antara **{x}** dan **{y}** "
+                f"dengan nilai p **{sig}** (p = {p:.4f})."
+            )
+        else:
+            st.write(
+                f"There is a **{strength} relationship** between **{x}** and **{y}**, "
+                f"and the result is **{sig}** (p = {p:.4f})."
+            )
+
+        # VISUALIZATION
+        xv = df[x].to_numpy(np.float64)
+        yv = df[y].to_numpy(np.float64)
+        fig2 = Figure()
+        ax2 = fig2.subplots()
+        if len(xv) > SCATTER_MAX_POINTS:
+            # Thousands of overlapping markers are slow to draw and unreadable
+            keep = ~(np.isnan(xv) | np.isnan(yv))
+            ax2.hexbin(xv[keep], yv[keep], gridsize=40, cmap="magma")
+        else:
+            ax2.scatter(xv, yv, s=8, alpha=0.5)
+        ax2.set_xlabel(x)
+        ax2.set_ylabel(y)
+        ax2.set_title("Correlation Scatter Plot")
+        st.pyplot(fig2)
+
 # --------------------------------------
 # SIDEBAR
 # --------------------------------------
 with st.sidebar:
     language = st.selectbox("🌐 Language / Bahasa", ["English", "Indonesia"])
+    T = LANG[language]
     page = st.radio(
         "Navigation",
-        [LANG[language]["home"], LANG[language]["analyzer"]],
+        [T["home"], T["analyzer"]],
         label_visibility="collapsed"
     )
 
-T = LANG[language]
-
 # --------------------------------------
 # HOME PAGE
 # --------------------------------------
@@ -152,8 +405,14 @@ else:
         # ======================
         # LOAD DATA
         # ======================
-        df = pd.read_excel(uploaded) if uploaded.name.endswith(("xlsx", "xls")) else pd.read_csv(uploaded)
-        numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
+        # Keep the parsed frame for this upload across reruns so the file
+        # bytes are neither re-hashed nor re-parsed on every interaction.
+        if st.session_state.get("df_key") != uploaded.file_id:
+            st.session_state["df"] = load_df(uploaded.getvalue(), uploaded.name)
+            st.session_state["df_key"] = uploaded.file_id
+            st.session_state["corr"] = {}
+        df = st.session_state["df"]
+        desc, numeric_cols = compute_desc(df)
 
         # ======================
         # DATA PREVIEW
@@ -168,19 +427,13 @@ else:
         # ======================
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader(T["desc_stat"])
-
-        desc = pd.DataFrame({
-            "Mean / Rata-rata": df[numeric_cols].mean(),
-            "Median": df[numeric_cols].median(),
-            "Mode": df[numeric_cols].mode().iloc[0],
-            "Minimum": df[numeric_cols].min(),
-            "Maximum": df[numeric_cols].max(),
-            "Std Deviation": df[numeric_cols].std()
-        })
-
         st.dataframe(desc)
         st.markdown('</div>', unsafe_allow_html=True)
 
+        if not numeric_cols:
+            st.info(T["no_numeric"])
+            st.stop()
+
         # ======================
         # FREQUENCY TABLE
         # ======================
@@ -188,15 +441,7 @@ else:
         st.subheader(T["freq"])
 
         col = st.selectbox("Variable", numeric_cols)
-        freq = df[col].value_counts().sort_index()
-        percent = df[col].value_counts(normalize=True).sort_index() * 100
-
-        freq_df = pd.DataFrame({
-            "Frequency": freq,
-            "Percentage (%)": percent.round(2)
-        })
-
-        st.dataframe(freq_df)
+        st.dataframe(frequency_table(df[col]))
         st.markdown('</div>', unsafe_allow_html=True)
 
         # ======================
@@ -204,14 +449,8 @@ else:
         # ======================
         st.markdown('<div class="card">', unsafe_allow_html=True)
 
-        fig, ax = plt.subplots(1, 2, figsize=(10, 4))
-        ax[0].hist(df[col], bins=5)
-        ax[0].set_title(T["hist"])
-
-        ax[1].boxplot(df[col], vert=False)
-        ax[1].set_title(T["box"])
-
-        st.pyplot(fig)
+        values = df[col].dropna().to_numpy()
+        st.image(hist_box_png(uploaded.file_id, col, T["hist"], T["box"], values))
         st.markdown('</div>', unsafe_allow_html=True)
 
         # ======================
@@ -221,54 +460,10 @@ else:
         st.subheader(T["corr"])
 
         # Filter X and Y variables
-        x_vars = [c for c in numeric_cols if c.lower() in ["x1","x2","x3","x4","x5","x_total"]]
-        y_vars = [c for c in numeric_cols if c.lower() in ["y1","y2","y3","y4","y5","y_total"]]
-
-        x = st.selectbox(T["select_x"], x_vars)
-        y = st.selectbox(T["select_y"], y_vars)
-        method = st.selectbox(T["method"], ["Pearson", "Spearman"])
-
-        if st.button(T["run"]):
-            if method == "Pearson":
-                r, p = stats.pearsonr(df[x], df[y])
-            else:
-                r, p = stats.spearmanr(df[x], df[y])
-
-            # RESULT
-            st.subheader(T["result"])
-            st.write(f"**Correlation (r)** : {r:.3f}")
-            st.write(f"**p-value** : {p:.4f}")
-
-            # INTERPRETATION
-            st.subheader(T["interp"])
-            strength = (
-                "very weak" if abs(r) < 0.2 else
-                "weak" if abs(r) < 0.4 else
-                "moderate" if abs(r) < 0.6 else
-                "strong" if abs(r) < 0.8 else
-                "very strong"
-            )
+        x_vars = [c for c in numeric_cols if c.lower() in X_VARS]
+        y_vars = [c for c in numeric_cols if c.lower() in Y_VARS]
 
-            sig = "significant" if p < 0.05 else "not significant"
-
-            if language == "Indonesia":
-                st.write(
-                    f"Terdapat **hubungan {strength}** antara **{x}** dan **{y}** "
-                    f"dengan nilai p **{sig}** (p = {p:.4f})."
-                )
-            else:
-                st.write(
-                    f"There is a **{strength} relationship** between **{x}** and **{y}**, "
-                    f"and the result is **{sig}** (p = {p:.4f})."
-                )
-
-            # VISUALIZATION
-            fig2, ax2 = plt.subplots()
-            ax2.scatter(df[x], df[y])
-            ax2.set_xlabel(x)
-            ax2.set_ylabel(y)
-            ax2.set_title("Correlation Scatter Plot")
-            st.pyplot(fig2)
+        correlation_card(df, x_vars, y_vars, T, language)
 
         st.markdown('</div>', unsafe_allow_html=True)
 